@@ -5,10 +5,12 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 import uuid
+from collections import deque
+from functools import cached_property
 from lxml import etree
 from typing import Any
 from .query import (
-    GetElement, GetText, GetDate, GetNumber, GetValue
+    clark_path, GetElement, GetText, GetDate, GetNumber, GetUnits, GetValue
 )
 
 # Setup namespace lookup
@@ -17,9 +19,31 @@ gnc_element = ns_lookup.get_namespace('http://www.gnucash.org/XML/gnc')
 trn_element = ns_lookup.get_namespace('http://www.gnucash.org/XML/trn')
 none_element = ns_lookup.get_namespace(None)
 
+# Tags of the book's elements in Clark notation
+_T_COMMODITY = clark_path('gnc:commodity')
+_T_ACCOUNT = clark_path('gnc:account')
+_T_TRANSACTION = clark_path('gnc:transaction')
+_T_SPLIT = clark_path('trn:split')
+
+# Paths of references to commodities and accounts in Clark notation
+_P_PRICE_COMMODITY = clark_path('price:commodity')
+_P_PRICE_CURRENCY = clark_path('price:currency')
+_P_ACT_COMMODITY = clark_path('act:commodity')
+_P_ACT_PARENT = clark_path('act:parent')
+_P_TRN_CURRENCY = clark_path('trn:currency')
+_P_SPLIT_ACCOUNT = clark_path('split:account')
+_P_CMDTY_SPACE = clark_path('cmdty:space')
+_P_CMDTY_ID = clark_path('cmdty:id')
+
 # Register namespace for commodities as they don't have a guid
 NAMESPACE_CMDTY = uuid.uuid4()
 
+def _commodity_key(space: str, symbol: str) -> str:
+    """Key of a commodity in the book's commodity index"""
+    # A flat string hashes faster than a (space, symbol) tuple and cannot
+    # collide as neither part contains NUL characters.
+    return f"{space}\x00{symbol}"
+
 class UnsupportedVersionError(Exception):
     """Raised when XML element version is not supported"""
     pass
@@ -62,29 +86,36 @@ class Book(etree.ElementBase):
             )
         # Initialize book and build index of objects
         self._index = {}
-        self._commodities = self.findall('gnc:commodity', self.nsmap)
-        self._accounts = self.findall('gnc:account', self.nsmap)
-        self._transactions = self.findall('gnc:transaction', self.nsmap)
+        self._commodity_index = {}
+        self._commodities = self.findall(_T_COMMODITY)
+        self._accounts = self.findall(_T_ACCOUNT)
+        self._transactions = self.findall(_T_TRANSACTION)
         self._prices = None
 
+        # Index of child accounts by parent GUID, in document order
+        self._children_by_parent = {}
+        for account in self._accounts:
+            self._children_by_parent.setdefault(account.parent_guid, []).append(account)
+        # Index of splits by account GUID, built on first use
+        self._splits_by_account = None
+
     def __repr__(self):
         return f"<Book {self.guid}>"
 
     def _find_commodity(self, obj: etree.ElementBase, path: str) -> Any:
-        """ Find a commodity in the book by its generated GUID from space and symbol. """
-        o = obj.find(path, namespaces=obj.nsmap)
+        """Find the commodity referenced at <path> (Clark notation) by space and symbol."""
+        o = obj.find(path)
         if o is not None:
-            c_space = o.findtext('cmdty:space', namespaces=o.nsmap)
-            c_symbol = o.findtext('cmdty:id', namespaces=o.nsmap)
-            guid = uuid.uuid5(NAMESPACE_CMDTY, f"{c_space}:{c_symbol}").hex
-            c_obj = self._index.get(guid)
+            c_space = o.findtext(_P_CMDTY_SPACE)
+            c_symbol = o.findtext(_P_CMDTY_ID)
+            c_obj = self._commodity_index.get(_commodity_key(c_space, c_symbol))
             if c_obj is None:
                 raise ValueError(f"Commodity {c_space}:{c_symbol} not found.")
             return c_obj
         
     def _find_account(self, obj: etree.ElementBase, path: str) -> Any:
-        """Find an account in the book by GUID."""
-        o = obj.find(path, namespaces=obj.nsmap)
+        """Find the account referenced at <path> (Clark notation) by GUID."""
+        o = obj.find(path)
         if o is not None:
             guid = o.text
             a_obj = self._index.get(guid)
@@ -92,6 +123,20 @@ class Book(etree.ElementBase):
                 raise ValueError(f"Account {guid} not found.")
             return a_obj
 
+    def _find_children(self, guid: str) -> list:
+        """Find the child accounts of an account by GUID."""
+        return list(self._children_by_parent.get(guid, ()))
+
+    def _find_splits(self, guid: str) -> list:
+        """Find the splits posted to an account by GUID."""
+        if self._splits_by_account is None:
+            # One pass that also loads the split list of every transaction
+            self._splits_by_account = {}
+            for transaction in self._transactions:
+                for split in transaction._split_list:
+                    self._splits_by_account.setdefault(split.account_guid, []).append(split)
+        return list(self._splits_by_account.get(guid, ()))
+
     # Public properties
     @property
     def commodities(self):
@@ -118,22 +163,42 @@ class Book(etree.ElementBase):
         """Additional book information stored in slots"""
         return self._slots_element
 
-    @property
-    def prices(self):
-        """
-        Price database with lazy loading of price entries.
-        Returns list of Price objects.
-        """
+    def _check_pricedb_version(self):
+        """Verify the version of the price database"""
         PRICEDB_VERSIONS = ['1']  # List of PriceDB supported versions
         version = self._pricedb_element.get('version', None)
         if version not in PRICEDB_VERSIONS:
             raise UnsupportedVersionError(
                 f"PriceDB version '{version}' not supported. Supported version: {PRICEDB_VERSIONS}"
             )
+
+    @property
+    def prices(self):
+        """
+        Price database with lazy loading of price entries.
+        Returns list of Price objects.
+        """
         if self._prices is None and self._pricedb_element is not None:
-            self._prices = self._pricedb_element.findall('price', namespaces=self.nsmap)
+            self._check_pricedb_version()
+            self._prices = self._pricedb_element.findall('price')
         return self._prices or []
 
+    def iter_prices(self, since=None, commodity=None):
+        """
+        Generate Price objects without building the list of all prices.
+        If given, only prices dated on or after <since> (a timezone aware
+        datetime) and/or prices of <commodity> are returned.
+        """
+        if self._pricedb_element is None:
+            return
+        self._check_pricedb_version()
+        for price in self._pricedb_element.iterfind('price'):
+            if since is not None and price.date < since:
+                continue
+            if commodity is not None and price.commodity is not commodity:
+                continue
+            yield price
+
     def walk(self):
         """Walk the account tree starting from root account"""
         return self.root_account.walk()    
@@ -180,14 +245,15 @@ class Commodity(etree.ElementBase):
             )
         book = self.getparent()
         book._index.setdefault(self.guid, self)
+        book._commodity_index.setdefault(_commodity_key(self.space, self.symbol), self)
 
     def __repr__(self):
         return f"<Commodity {self.space}:{self.symbol}>"
     
-    @property
+    @cached_property
     def guid(self):
         """
-        Generate a unique identifier for the commodity.
+        Generate a unique identifier for the commodity (computed once).
         The GUID is derived from namespace and symbol since commodities
         don't have GUIDs in the XML file.
         """
@@ -221,17 +287,17 @@ class Price(etree.ElementBase):
     def __repr__(self):
         return f"<Price {self.date:%Y-%m-%d} {self.commodity}/{self.currency}: {self.value}>"
 
-    @property
+    @cached_property
     def commodity(self):
         """The commodity being priced"""
         book = self.getparent().getparent()
-        return book._find_commodity(self, 'price:commodity')
+        return book._find_commodity(self, _P_PRICE_COMMODITY)
 
-    @property
+    @cached_property
     def currency(self):
         """The currency in which the price is expressed"""
         book = self.getparent().getparent()
-        return book._find_commodity(self, 'price:currency')
+        return book._find_commodity(self, _P_PRICE_CURRENCY)
     
 
 @gnc_element('account')
@@ -280,40 +346,36 @@ class Account(etree.ElementBase):
     def __repr__(self):
         return f'<Account {self.name}>'
     
-    @property
+    @cached_property
     def commodity(self):
         book = self.getparent()
-        return book._find_commodity(self, 'act:commodity')
+        return book._find_commodity(self, _P_ACT_COMMODITY)
     
-    @property
+    @cached_property
     def parent(self):
         book = self.getparent()
-        return book._find_account(self, 'act:parent')
+        return book._find_account(self, _P_ACT_PARENT)
 
     @property
     def children(self):
         """List of child accounts"""
         book = self.getparent()
-        expr = './gnc:account[act:parent/text() = $guid]'
-        return book.xpath(expr, guid=self.guid, namespaces=self.nsmap)
+        return book._find_children(self.guid)
 
     @property
     def splits(self):
         """List of splits posted to this account"""
         book = self.getparent()
-        expr = './gnc:transaction/trn:splits/trn:split[split:account/text() = $guid]'
-        return book.xpath(expr, guid=self.guid, namespaces=self.nsmap)
-        # expr = '/gnc-v2/gnc:book/gnc:transaction/trn:splits/trn:split/split:account[text() = $guid]/parent::*'
-        # return self.xpath(expr, guid=self.guid, namespaces=self.nsmap)
+        return book._find_splits(self.guid)
 
     @property
     def slots(self):
         """Additional account information stored in slots"""
         return self._slots_element
 
-    @property
+    @cached_property
     def fullname(self):
-        """Full hierarchical account name separated by colons"""
+        """Full hierarchical account name separated by colons (computed once)"""
         if self.parent is not None:
             pfn = self.parent.fullname
             if pfn:
@@ -332,10 +394,10 @@ class Account(etree.ElementBase):
         You can modify the list of sub_accounts, but should not modify
         the list of splits.
         """
-        accounts = [self]
+        accounts = deque([self])
         while accounts:
-            acc, accounts = accounts[0], accounts[1:]
-            children = list(acc.children)
+            acc = accounts.popleft()
+            children = acc.children
             yield acc, children, acc.splits
             accounts.extend(children)
 
@@ -384,17 +446,22 @@ class Transaction(etree.ElementBase):
     def __repr__(self):
         return f"<Transaction {self.guid} on {self.date}: {self.description}>"
     
-    @property
+    @cached_property
     def currency(self):
         book = self.getparent()
-        return book._find_commodity(self, 'trn:currency')
+        return book._find_commodity(self, _P_TRN_CURRENCY)
     
+    @cached_property
+    def _split_list(self):
+        """The transaction's splits, loaded once"""
+        if self._splits_element is not None:
+            return self._splits_element.findall(_T_SPLIT)
+        return []
+
     @property
     def splits(self):
         """Lazy loads the transaction's splits"""
-        if self._splits_element is not None:
-            return self._splits_element.findall('trn:split', namespaces=self.nsmap)
-        return []
+        return list(self._split_list)
 
     @property
     def slots(self):
@@ -415,8 +482,10 @@ class Split(etree.ElementBase):
         split:reconcile-date  -> reconcile_date (datetime): Date of reconciliation
         split:value          -> value (Decimal): Value in transaction currency
         split:quantity       -> quantity (Decimal): Amount in account commodity
+                             -> quantity_units (int): Amount in smallest units of account commodity
         split:action         -> action (str): Type of action
         split:account        -> account (Account): Reference to account
+                             -> account_guid (str): Account's GUID
         split:slots         -> slots (ElementBase): Additional information
 
     Not Implemented:
@@ -430,22 +499,25 @@ class Split(etree.ElementBase):
     reconcile_date = GetDate('split:reconcile-date/ts:date')
     value = GetNumber('split:value')
     quantity = GetNumber('split:quantity')
+    quantity_units = GetUnits('split:quantity', 'account.commodity_scu')
     action = GetText('split:action')
+    account_guid = GetText('split:account')
 
     # Internal XML elements
     _slots_element = GetElement('split:slots')
 
-    @property
+    @cached_property
     def transaction(self):
-        return self.getparent()
+        """The transaction containing this split (parent of <trn:splits/>)"""
+        return self.getparent().getparent()
 
     def __repr__(self):
         return f"<Split {self.transaction.date} '{self.account}' {self.value}>"
     
-    @property
+    @cached_property
     def account(self):
         book = self.transaction.getparent()
-        return book._find_account(self, 'split:account')
+        return book._find_account(self, _P_SPLIT_ACCOUNT)
     
     @property
     def slots(self):
@@ -6,6 +6,7 @@
 
 from lxml import etree
 from .model import Book, Commodity, Account, Transaction, Price, Split, Slot, ns_lookup
+from .query import clark_path
 
 def load(source) -> Book:
     """
@@ -14,9 +15,19 @@ def load(source) -> Book:
     # Not implemented:
     # - gnc:count-data
 
-    parser = etree.XMLParser()
+    # - remove_blank_text: drop indentation between elements (text of leaf
+    #   elements is kept, even if it is whitespace only)
+    # - huge_tree: large books exceed libxml2's default size limits
+    # - collect_ids: GnuCash XML has no xml:id attributes to index
+    # - resolve_entities: GnuCash XML uses no custom entities
+    parser = etree.XMLParser(
+        remove_blank_text=True,
+        huge_tree=True,
+        collect_ids=False,
+        resolve_entities=False,
+    )
     parser.set_element_class_lookup(ns_lookup)
     root = etree.parse(source, parser=parser).getroot()
-    return root.find('gnc:book', root.nsmap)
+    return root.find(clark_path('gnc:book'))
 
 # Contains AI-generated edits.
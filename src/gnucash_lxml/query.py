@@ -5,15 +5,159 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 import decimal
+import operator
+import sys
 from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from dateutil.parser import parse as parse_date
 from lxml import etree
 from typing import Any
 
+# Namespace prefixes used in GnuCash XML files (see <gnc-v2/> root element).
+# They are fixed, so there is no need to collect them from element.nsmap.
+NSMAP = {
+    'gnc': 'http://www.gnucash.org/XML/gnc',
+    'act': 'http://www.gnucash.org/XML/act',
+    'book': 'http://www.gnucash.org/XML/book',
+    'cd': 'http://www.gnucash.org/XML/cd',
+    'cmdty': 'http://www.gnucash.org/XML/cmdty',
+    'price': 'http://www.gnucash.org/XML/price',
+    'slot': 'http://www.gnucash.org/XML/slot',
+    'split': 'http://www.gnucash.org/XML/split',
+    'sx': 'http://www.gnucash.org/XML/sx',
+    'trn': 'http://www.gnucash.org/XML/trn',
+    'ts': 'http://www.gnucash.org/XML/ts',
+    'fs': 'http://www.gnucash.org/XML/fs',
+    'bgt': 'http://www.gnucash.org/XML/bgt',
+    'recurrence': 'http://www.gnucash.org/XML/recurrence',
+    'lot': 'http://www.gnucash.org/XML/lot',
+    'addr': 'http://www.gnucash.org/XML/addr',
+    'billterm': 'http://www.gnucash.org/XML/billterm',
+    'bt-days': 'http://www.gnucash.org/XML/bt-days',
+    'bt-prox': 'http://www.gnucash.org/XML/bt-prox',
+    'cust': 'http://www.gnucash.org/XML/cust',
+    'employee': 'http://www.gnucash.org/XML/employee',
+    'entry': 'http://www.gnucash.org/XML/entry',
+    'invoice': 'http://www.gnucash.org/XML/invoice',
+    'job': 'http://www.gnucash.org/XML/job',
+    'order': 'http://www.gnucash.org/XML/order',
+    'owner': 'http://www.gnucash.org/XML/owner',
+    'taxtable': 'http://www.gnucash.org/XML/taxtable',
+    'tte': 'http://www.gnucash.org/XML/tte',
+    'vendor': 'http://www.gnucash.org/XML/vendor',
+}
+
+def clark_path(path: str) -> str:
+    """Translate a prefixed path ('price:time/ts:date') into Clark notation"""
+    steps = []
+    for step in path.split('/'):
+        prefix, sep, tag = step.rpartition(':')
+        steps.append(f"{{{NSMAP[prefix]}}}{tag}" if sep else step)
+    return '/'.join(steps)
+
+# Child elements holding the date of gdate and timespec slot values
+_GDATE_TAG = 'gdate'
+_TS_DATE_TAG = clark_path('ts:date')
+
+# Time zones by GnuCash UTC offset string, e.g. '+0200'
+_timezones: dict = {}
+
+def _parse_timezone(offset: str) -> timezone:
+    """Return the time zone for a '+HHMM' / '-HHMM' offset"""
+    tz = _timezones.get(offset)
+    if tz is None:
+        if len(offset) != 5 or offset[0] not in '+-':
+            raise ValueError(f"Invalid UTC offset {offset!r}")
+        delta = timedelta(hours=int(offset[1:3]), minutes=int(offset[3:5]))
+        tz = _timezones[offset] = timezone(-delta if offset[0] == '-' else delta)
+    return tz
+
+def _parse_gnc_timestamp(s: str) -> datetime:
+    """Parse the fixed <ts:date/> format, e.g. '2017-05-03 14:00:00 +0000'"""
+    if len(s) != 25 or s[4] != '-' or s[7] != '-' or s[10] != ' ' \
+            or s[13] != ':' or s[16] != ':' or s[19] != ' ':
+        raise ValueError(f"Invalid GnuCash timestamp {s!r}")
+    return datetime(int(s[0:4]), int(s[5:7]), int(s[8:10]),
+                    int(s[11:13]), int(s[14:16]), int(s[17:19]),
+                    tzinfo=_parse_timezone(s[20:25]))
+
+# datetime.fromisoformat (in C) accepts the GnuCash format since Python 3.11
+if sys.version_info >= (3, 11):
+    _parse_timestamp_fast = datetime.fromisoformat
+else:
+    _parse_timestamp_fast = _parse_gnc_timestamp
+
+# Parsed dates are cached by raw string; datetimes are immutable and the
+# same dates repeat a lot across transactions, splits and prices
+@lru_cache(maxsize=8192)
+def _parse_timestamp(date_str: str) -> datetime:
+    """Parse a GnuCash timestamp, falling back to dateutil for other formats"""
+    try:
+        return _parse_timestamp_fast(date_str)
+    except ValueError:
+        return parse_date(date_str)
+
+@lru_cache(maxsize=8192)
+def _parse_gdate(date_str: str) -> datetime:
+    """Parse a GnuCash <gdate/> ('YYYY-MM-DD'), falling back to dateutil"""
+    try:
+        return datetime.fromisoformat(date_str[:10])
+    except ValueError:
+        return parse_date(date_str)
+
+# Exponents of the power-of-ten denominators used for (almost) all commodities
+_POW10 = {str(10 ** k): -k for k in range(13)}
+
+# Bounded, so that loading many books does not grow the cache without limit
+@lru_cache(maxsize=65536)
+def _parse_number(number_str: str) -> decimal.Decimal:
+    """Parse a GnuCash number 'numerator/denominator' into a Decimal (cached)"""
+    numerator, sep, denominator = number_str.partition("/")
+    if not sep:
+        raise ValueError(f"Invalid GnuCash number {number_str!r}")
+    exponent = _POW10.get(denominator)
+    if exponent is not None:
+        # Exact construction from scientific notation, no division needed
+        return decimal.Decimal(f"{numerator}E{exponent}")
+    return decimal.Decimal(numerator) / decimal.Decimal(denominator)
+
 class QueryBase(ABC):
     """Base class for XML element query descriptors"""
+    __slots__ = ('path', 'name', '_clark_path', '_xpath_text')
+
+    def __init__(self, path: str):
+        self.path = path
+        # Clark notation ('{uri}tag') lets lxml skip prefix resolution
+        self._clark_path = clark_path(path)
+        # Compiled once; plain strings without a reference back to their element
+        self._xpath_text = etree.XPath(f"{path}/text()", namespaces=NSMAP, smart_strings=False)
+
+    def _find(self, obj: etree.ElementBase) -> Any:
+        """Return the first element matching the path or None"""
+        return obj.find(self._clark_path)
+
+    def _findtext(self, obj: etree.ElementBase) -> Any:
+        """Return the text of the first element matching the path or None"""
+        return obj.findtext(self._clark_path)
+
+    def _findvalue(self, obj: etree.ElementBase) -> Any:
+        """Return the non-empty text of the first element matching the path or None"""
+        result = self._xpath_text(obj)
+        return result[0] if result else None
+
+    def __set_name__(self, owner: type, name: str):
+        self.name = name
+
     def __get__(self, obj: etree.ElementBase, obj_type=None) -> Any:
-        return self.query_function(obj)
+        if obj is None:
+            return self
+        # The tree is not modified after loading, so the result is stored in
+        # the instance dict. As there is no __set__, it shadows the descriptor
+        # on further lookups for as long as lxml keeps this proxy alive.
+        value = self.query_function(obj)
+        obj.__dict__[self.name] = value
+        return value
     
     @abstractmethod
     def query_function(self, obj: etree.ElementBase) -> Any:
@@ -23,70 +167,108 @@ class QueryBase(ABC):
 
 class GetElement(QueryBase):
     """Query descriptor to retrieve an XML element by path"""
-    def __init__(self, path: str):
-        self.path = path
+    __slots__ = ()
 
     def query_function(self, obj: etree.ElementBase) -> etree.ElementBase:
-        return obj.find(self.path, namespaces=obj.nsmap)
+        return self._find(obj)
 
 
 class GetText(QueryBase):
     """Query descriptor to retrieve text content of an XML element by path"""
-    def __init__(self, path: str):
-        self.path = path
+    __slots__ = ()
 
     def query_function(self, obj: etree.ElementBase) -> str:
-        return obj.findtext(self.path, default=None, namespaces=obj.nsmap)
+        return self._findtext(obj)
 
 class GetDate(QueryBase):
     """Query descriptor to retrieve a date from an XML element by path"""
-    def __init__(self, path: str):
-        self.path = path
+    __slots__ = ()
 
     def query_function(self, obj: etree.ElementBase) -> Any:
-        date_str = obj.findtext(self.path, default=None, namespaces=obj.nsmap)
+        date_str = self._findvalue(obj)
         if date_str is not None:
-            return parse_date(date_str)
+            return _parse_timestamp(date_str)
 
 
 class GetNumber(QueryBase):
     """Query descriptor to retrieve a number from an XML element by path"""
-    def __init__(self, path: str):
-        self.path = path
+    __slots__ = ()
 
     def query_function(self, obj: etree.ElementBase) -> decimal.Decimal:
-        number_str = obj.findtext(self.path, default=None,namespaces=obj.nsmap)
+        number_str = self._findvalue(obj)
+        return _parse_number(number_str)
+
+class GetUnits(QueryBase):
+    """
+    Query descriptor to retrieve a number as integer count of smallest units.
+    The smallest unit fraction (e.g. '100' for cents) is read from the
+    (dotted) attribute <scu_attr> of the element.
+    """
+    __slots__ = ('scu_attr', '_get_scu')
+
+    def __init__(self, path: str, scu_attr: str):
+        super().__init__(path)
+        self.scu_attr = scu_attr
+        self._get_scu = operator.attrgetter(scu_attr)
+
+    def query_function(self, obj: etree.ElementBase) -> int:
+        number_str = self._findvalue(obj)
         numerator, denominator = number_str.split("/")
-        return decimal.Decimal(numerator) / decimal.Decimal(denominator)
+        scu = int(self._get_scu(obj))
+        units, remainder = divmod(int(numerator) * scu, int(denominator))
+        if remainder:
+            raise ValueError(f"Number {number_str} is not a multiple of 1/{scu}")
+        return units
 
 class GetValue(QueryBase):
     """Query descriptor to retrieve a value from an XML element by path"""
-    def __init__(self, path: str):
-        self.path = path
+    __slots__ = ()
+
+    def _as_int(self, e: etree.ElementBase) -> int:
+        return int(e.text)
+
+    def _as_number(self, e: etree.ElementBase) -> decimal.Decimal:
+        return _parse_number(e.text)
+
+    def _as_text(self, e: etree.ElementBase) -> str:
+        return e.text
+
+    def _as_gdate(self, e: etree.ElementBase) -> datetime:
+        return _parse_gdate(e.findtext(_GDATE_TAG))
+
+    def _as_timespec(self, e: etree.ElementBase) -> datetime:
+        return _parse_timestamp(e.findtext(_TS_DATE_TAG))
+
+    # Frames and lists are returned as tuples: values are cached on the slot
+    # element and shared by all readers, so they must not be mutable.
+    def _as_frame(self, e: etree.ElementBase) -> tuple:
+        return tuple(e) # type: ignore
+
+    def _as_list(self, e: etree.ElementBase) -> tuple:
+        return tuple(map(self.value_lookup, e)) # type: ignore
+
+    # Value conversion by slot type
+    _HANDLERS = {
+        'integer': _as_int,
+        'double': _as_int,
+        'numeric': _as_number,
+        'string': _as_text,
+        'guid': _as_text,
+        'gdate': _as_gdate,
+        'timespec': _as_timespec,
+        'frame': _as_frame,
+        'list': _as_list,
+    }
 
     def value_lookup(self, e: etree.ElementBase) -> Any:
-        value_str = e.text
         value_type = e.get('type', default='string')
-        if value_type in ('integer', 'double'):
-            return int(value_str)
-        elif value_type == 'numeric':
-            numerator, denominator = value_str.split("/")
-            return decimal.Decimal(numerator) / decimal.Decimal(denominator)
-        elif value_type in ('string', 'guid'):
-            return value_str
-        elif value_type == 'gdate':
-            return parse_date(e.findtext("gdate", default=None, namespaces=e.nsmap))
-        elif value_type == 'timespec':
-            return parse_date(e.findtext('ts:date', default=None, namespaces=e.nsmap))
-        elif value_type == 'frame':
-            return list(e) # type: ignore 
-        elif value_type == 'list':
-            return [self.value_lookup(list_e) for list_e in e] # type: ignore
-        else:
+        handler = self._HANDLERS.get(value_type)
+        if handler is None:
             raise RuntimeError(f"Unknown slot type {value_type}")
+        return handler(self, e)
 
     def query_function(self, obj: etree.ElementBase) -> Any:
-        e: etree.ElementBase = obj.find(self.path, obj.nsmap)
+        e: etree.ElementBase = self._find(obj)
         return self.value_lookup(e)
 
 
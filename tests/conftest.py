@@ -2,10 +2,8 @@ import pytest
 from pathlib import Path
 from gnucash_lxml import load
 
-# We open the sample.gnucash file ONCE per test session
-# Background: GetAccount and GetCommodity ahave global (class-level) dictionaries
-# that are used to cache the objects. This is done to avoid
-# having to search the entire XML tree for each object.
+# The sample.gnucash file is loaded for each test. All indices (commodities,
+# accounts, children, splits) are kept per Book, so tests do not share state.
 @pytest.fixture()
 def data_dir() -> Path:
     """Return path to test data directory"""
@@ -0,0 +1,81 @@
+from datetime import datetime, timezone, timedelta
+import pytest
+from decimal import Decimal
+from lxml import etree
+from gnucash_lxml.model import Account, ns_lookup
+from gnucash_lxml.query import GetText, clark_path, _parse_timestamp, _parse_gnc_timestamp, _parse_gdate, _parse_number
+
+def test_parse_timestamp():
+    """Test parsing of the GnuCash timestamp format"""
+    d = _parse_timestamp("2017-05-03 14:00:00 +0200")
+    assert d == datetime(2017, 5, 3, 14, 0, 0, tzinfo=timezone(timedelta(hours=2)))
+
+def test_parse_timestamp_negative_offset():
+    """Test parsing of timestamps west of UTC"""
+    d = _parse_timestamp("2017-05-03 14:00:00 -0530")
+    assert d.utcoffset() == -timedelta(hours=5, minutes=30)
+
+def test_parse_gnc_timestamp():
+    """Test the slicing parser used before Python 3.11"""
+    for s in ("2017-05-03 14:00:00 +0200", "2017-05-03 14:00:00 -0530", "2017-05-03 14:00:00 +0000"):
+        assert _parse_gnc_timestamp(s) == datetime.strptime(s, "%Y-%m-%d %H:%M:%S %z")
+    with pytest.raises(ValueError):
+        _parse_gnc_timestamp("2017-05-03T14:00:00Z")
+
+def test_parse_timestamp_fallback():
+    """Test fallback to dateutil for non-standard formats"""
+    d = _parse_timestamp("2017-05-03T14:00:00Z")
+    assert d == datetime(2017, 5, 3, 14, 0, 0, tzinfo=timezone.utc)
+
+def test_parse_gdate():
+    """Test parsing of <gdate/> values"""
+    assert _parse_gdate("2017-05-03") == datetime(2017, 5, 3)
+
+def test_parse_timestamp_cached():
+    """Test that identical date strings are parsed only once"""
+    assert _parse_timestamp("2020-01-01 10:59:00 +0000") is _parse_timestamp("2020-01-01 10:59:00 +0000")
+
+def test_parse_number():
+    """Test parsing of GnuCash 'numerator/denominator' numbers"""
+    assert _parse_number("12345/100") == Decimal("123.45")
+    assert _parse_number("-12345/100").as_tuple() == Decimal("-123.45").as_tuple()
+    assert _parse_number("-5/1") == Decimal("-5")
+    assert _parse_number("1/3") == Decimal(1) / Decimal(3)
+    with pytest.raises(ValueError):
+        _parse_number("12345")
+
+def test_clark_path():
+    """Test translation of prefixed paths into Clark notation"""
+    assert clark_path('price:time/ts:date') == \
+        '{http://www.gnucash.org/XML/price}time/{http://www.gnucash.org/XML/ts}date'
+    assert clark_path('gdate') == 'gdate'
+
+def test_descriptor_cached(sample_gnucash):
+    """Test that descriptor results are stored on the element"""
+    assert isinstance(Account.name, GetText)
+    account = sample_gnucash.root_account
+    assert 'name' not in account.__dict__
+    assert account.name == "Root Account"
+    assert account.__dict__['name'] == "Root Account"
+
+def test_slot_values(sample_gnucash):
+    """Test conversion of slot values by type"""
+    slots = {slot.key: slot.value for slot in sample_gnucash.slots}
+    assert isinstance(slots['counters'], tuple)
+    counters = {slot.key: slot.value for slot in slots['counters']}
+    assert counters['gncInvoice'] == 0
+
+def test_slot_date_values():
+    """Test conversion of gdate and timespec slot values"""
+    parser = etree.XMLParser()
+    parser.set_element_class_lookup(ns_lookup)
+    slots = etree.fromstring(
+        '<slots xmlns:slot="http://www.gnucash.org/XML/slot" xmlns:ts="http://www.gnucash.org/XML/ts">'
+        '<slot><slot:key>a</slot:key><slot:value type="gdate"><gdate>2020-01-02</gdate></slot:value></slot>'
+        '<slot><slot:key>b</slot:key><slot:value type="timespec"><ts:date>2020-01-02 10:59:00 +0000</ts:date></slot:value></slot>'
+        '</slots>', parser)
+    values = {slot.key: slot.value for slot in slots}
+    assert values['a'] == datetime(2020, 1, 2)
+    assert values['b'] == datetime(2020, 1, 2, 10, 59, tzinfo=timezone.utc)
+
+# Contains AI-generated edits.
@@ -1,5 +1,6 @@
 import pytest
 from decimal import Decimal
+from gnucash_lxml import load
 from gnucash_lxml.model import Book, Account, Transaction, Commodity
 
 def test_book_properties(sample_gnucash):
@@ -33,6 +34,23 @@ def test_account_tree(sample_gnucash):
                 assert account.parent is None
             assert account in account.parent.children
 
+def test_account_splits(sample_gnucash):
+    """Test that every split is listed exactly once under its account"""
+    all_splits = [split for txn in sample_gnucash.transactions for split in txn.splits]
+    account_splits = []
+    for account in sample_gnucash.accounts:
+        for split in account.splits:
+            assert split.account is account
+            account_splits.append(split)
+    assert len(account_splits) == len(all_splits)
+
+def test_split_quantity_units(sample_gnucash):
+    """Test integer quantities in smallest units of the account commodity"""
+    for txn in sample_gnucash.transactions:
+        for split in txn.splits:
+            scu = int(split.account.commodity_scu)
+            assert split.quantity_units == split.quantity * scu
+
 def test_commodity_instances(sample_gnucash):
     """Loop over all commodities and assert each is a Commodity instance."""
     for comm in sample_gnucash.commodities:
@@ -51,7 +69,7 @@ def test_transaction_splits_balanced(sample_gnucash):
     """Test that all transactions have balanced splits (sum to zero)."""
     for txn in sample_gnucash.transactions:
         # Sum up all split values in the transaction
-        split_sum = sum(Decimal(split.value) for split in txn.splits)
+        split_sum = sum((split.value for split in txn.splits), Decimal(0))
         # The sum should be zero (balanced transaction)
         assert split_sum == 0, f"Transaction {txn.guid} is not balanced: sum={split_sum}"
 
@@ -65,4 +83,22 @@ def test_pricedb_entries(sample_gnucash):
         assert price.value is not None
         assert price.date is not None
 
+def test_iter_prices(sample_gnucash):
+    """Test filtering of pricedb entries by date and commodity"""
+    prices = sample_gnucash.prices
+    assert list(sample_gnucash.iter_prices()) == prices
+    since = max(price.date for price in prices)
+    assert all(price.date == since for price in sample_gnucash.iter_prices(since=since))
+    commodity = prices[0].commodity
+    filtered = list(sample_gnucash.iter_prices(commodity=commodity))
+    assert filtered == [price for price in prices if price.commodity is commodity]
+
+def test_books_independent(sample_gnucash, data_dir):
+    """Test that a second loaded book does not share indices with the first"""
+    other = load(data_dir / "sample.gnucash")
+    for book in (sample_gnucash, other):
+        for account in book.root_account.children:
+            assert account.getparent() is book
+            assert account.commodity.getparent() is book
+
 # Contains AI-generated edits.
\ No newline at end of file